@@ -1,17 +1,25 @@
 import os
+import uuid
 import logging
+import threading
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 
 # Force Python to load modules from src/
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
 
-from query_rag import generate_sql
+from query_rag import generate_sql, load_full_schema, load_vector_store
 from pipeline_agent import rows_to_csv, generate_insights
+import columnar_backend
+from sql_validator import validate_sql, load_catalog, SQLValidationError
+from query_registry import REGISTRY, QueryCancelled
+from query_cache import (SQL_CACHE, RESULT_CACHE, RESULT_CACHE_MAX_ROWS,
+                         log_question, top_questions)
+from warmup import Warmup
 
 # ─── Configure Flask ─────────────────────────────────────────────────────
 logging.basicConfig(level=logging.DEBUG)
@@ -25,6 +33,187 @@ PGPORT     = int(os.getenv("PGPORT", "5433"))
 PGUSER     = os.getenv("PGUSER", "postgres")
 PGPASSWORD = os.getenv("PGPASSWORD", "aryan2008")
 DB_NAME    = os.getenv("DB_NAME", "health_data_db")
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "2"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+
+# ─── Warmup settings ──────────────────────────────────────────────────────
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"   # start warmup when the app is imported
+WARMUP_TOP_N    = int(os.getenv("WARMUP_TOP_N", "20"))       # questions replayed from the query log
+WARMUP_TABLES   = [t.strip() for t in os.getenv(
+    "WARMUP_TABLES",
+    "fct_pharmacy_clear_claim_allstatus_cluster_brand,diagnosis_and_procedures"
+).split(",") if t.strip()]
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(PG_POOL_MAX)   # block instead of PoolError when exhausted
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Create the Postgres pool on first use (opens PG_POOL_MIN connections)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                PG_POOL_MIN, PG_POOL_MAX,
+                host=PGHOST, port=PGPORT,
+                user=PGUSER, password=PGPASSWORD,
+                dbname=DB_NAME
+            )
+    return _pool
+
+
+def _backend(data):
+    """Per-query backend override from the request body; ValueError if unknown."""
+    backend = data.get('backend')
+    if backend and str(backend).lower() not in columnar_backend.BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {columnar_backend.BACKENDS}")
+    return backend
+
+
+def _session_id(data) -> str:
+    """Per-tab id sent by the front-end, else a cookie-backed one."""
+    if data.get('session_id'):
+        return str(data['session_id'])
+    return session.setdefault('sid', uuid.uuid4().hex)
+
+
+def run_query(sql_query, backend=None, session_id=None, request_id=None):
+    """
+    Execute on the chosen backend and return (columns, rows).
+    Tracked in REGISTRY so a newer query from the same session or /cancel
+    interrupts it; raises QueryCancelled in that case.
+    """
+    session_id = session_id or uuid.uuid4().hex
+    request_id = request_id or uuid.uuid4().hex
+    with REGISTRY.track(session_id, request_id) as q:
+        if columnar_backend.choose_backend(sql_query, backend) == "columnar":
+            try:
+                return columnar_backend.execute_sql(
+                    sql_query, on_connect=lambda con: q.attach(con.interrupt)
+                )
+            except columnar_backend.ColumnarUnsupported as e:
+                if backend:
+                    raise   # explicitly requested: report it, don't switch silently
+                app.logger.warning(f"[run_query] Columnar backend can't run query, using Postgres: {e}")
+            finally:
+                # execute_sql has closed `con`; its interrupt must not be called any more
+                q.detach()
+
+        pool = get_pool()
+        with _pool_slots:
+            conn = pool.getconn()
+            try:
+                q.attach(conn.cancel)
+                cur = conn.cursor()
+                cur.execute(sql_query)
+                cols = [d[0] for d in cur.description]
+                rows = cur.fetchall()
+                cur.close()
+            finally:
+                # no late cancel may hit the connection once it's back in the pool
+                q.detach()
+                pool.putconn(conn, close=bool(conn.closed))
+        return cols, rows
+
+
+def cached_generate_sql(nlp_query: str, regenerate: bool = False) -> str:
+    """
+    generate_sql behind SQL_CACHE, keyed by the normalized question.
+    regenerate=True (the UI's Retry) skips the lookup and overwrites the entry.
+    """
+    key = nlp_query.lower().strip()
+    sql = None if regenerate else SQL_CACHE.get(key)
+    if sql is None:
+        sql = generate_sql(nlp_query, debug=False)
+        SQL_CACHE.put(key, sql)
+    return sql
+
+
+def evict_generated_sql(nlp_query: str, sql: str):
+    """Drop the cached SQL for a question once that SQL failed validation or execution."""
+    key = nlp_query.lower().strip()
+    if key and (SQL_CACHE.get(key) or "").strip() == sql.strip():
+        SQL_CACHE.pop(key)
+
+
+def cached_run_query(checked, backend=None, session_id=None, request_id=None):
+    """
+    run_query behind RESULT_CACHE, keyed by backend + canonical SQL.
+    Only results of at most RESULT_CACHE_MAX_ROWS rows are kept.
+    """
+    key = (columnar_backend.choose_backend(checked.sql, backend), checked.canonical)
+    result = RESULT_CACHE.get(key)
+    if result is not None and session_id:
+        # a cache hit is still a newer request: stop the session's older query
+        REGISTRY.cancel(session_id, reason="superseded")
+    if result is None:
+        result = run_query(checked.sql, backend, session_id, request_id)
+        if len(result[1]) <= RESULT_CACHE_MAX_ROWS:
+            RESULT_CACHE.put(key, result)
+    return result
+
+
+# ─── Startup warmup ───────────────────────────────────────────────────────
+def _warm_schema():
+    load_full_schema()
+    load_catalog()
+
+
+def _warm_tables():
+    """Pull the hot tables into cache (pg_prewarm if installed, else a full scan)."""
+    for table in WARMUP_TABLES:
+        sql = f"SELECT COUNT(*) FROM {table}"
+        # tracked like any query so /metrics in_flight covers it
+        with REGISTRY.track("warmup", f"prewarm:{table}") as q:
+            if columnar_backend.choose_backend(sql) == "columnar":
+                try:
+                    columnar_backend.execute_sql(sql, on_connect=lambda con: q.attach(con.interrupt))
+                finally:
+                    q.detach()
+                continue
+            pool = get_pool()
+            # requests are already being served: share the same slots
+            with _pool_slots:
+                conn = pool.getconn()
+                try:
+                    q.attach(conn.cancel)
+                    cur = conn.cursor()
+                    try:
+                        cur.execute("SELECT pg_prewarm(%s)", (table,))
+                    except psycopg2.Error:
+                        conn.rollback()
+                        cur.execute(sql)
+                    cur.fetchall()
+                    cur.close()
+                finally:
+                    q.detach()
+                    pool.putconn(conn, close=bool(conn.closed))
+
+
+def _warm_caches():
+    """Replay the most frequent logged questions to fill SQL_CACHE and RESULT_CACHE."""
+    questions = top_questions(WARMUP_TOP_N)
+    for i, question in enumerate(questions, 1):
+        WARMUP.progress(f"{i}/{len(questions)}")
+        sql = None
+        try:
+            sql = cached_generate_sql(question)
+            checked = validate_sql(sql)
+            cached_run_query(checked, session_id="warmup")
+        except Exception as e:
+            if sql is not None:
+                evict_generated_sql(question, sql)
+            app.logger.warning(f"[warmup] replay failed for {question!r}: {e}")
+
+
+WARMUP = Warmup([
+    ("load schema",     _warm_schema),
+    ("load retriever",  load_vector_store),
+    ("open db pool",    get_pool),
+    ("pre-touch tables", _warm_tables),
+    ("replay query log", _warm_caches),
+])
 
 
 @app.route('/')
@@ -32,6 +221,13 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/ready')
+def ready_endpoint():
+    WARMUP.start()   # no-op once started; covers WARMUP_ON_START=0
+    status = WARMUP.status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+
 @app.route('/generate_sql', methods=['POST'])
 def generate_sql_endpoint():
     data = request.get_json()
@@ -39,14 +235,27 @@ def generate_sql_endpoint():
     if not nlp_query:
         return jsonify(error='No query provided', sql=''), 400
 
+    # only a JSON true counts: the string "false" must not bypass the cache
+    regenerate = data.get('regenerate') is True
+
     app.logger.info(f"[generate_sql] NL query: {nlp_query}")
     try:
-        # 1) Generate the raw SQL
-        sql = generate_sql(nlp_query, debug=False)
+        # 1) Generate the raw SQL (cached per normalized question; Retry regenerates)
+        sql = cached_generate_sql(nlp_query, regenerate=regenerate)
         # 2) Strip any trailing backticks or fences
         import re
         sql = re.sub(r'```+$', '', sql).strip()
+        # 3) Log for warmup replay: only answered questions, and not Retry repeats
+        if not regenerate:
+            try:
+                log_question(nlp_query)
+            except OSError as e:
+                app.logger.warning(f"[generate_sql] Could not write query log: {e}")
         return jsonify(sql=sql, query=nlp_query)
+    except SQLValidationError as e:
+        # the model produced SQL that doesn't parse or doesn't match the schema
+        app.logger.warning(f"[generate_sql] Invalid SQL: {e}")
+        return jsonify(error=str(e), sql=''), 422
     except Exception as e:
         app.logger.error(f"[generate_sql] Failed: {e}", exc_info=True)
         return jsonify(error=str(e), sql=''), 500
@@ -59,31 +268,55 @@ def execute_sql_endpoint():
     sql_query = data.get('sql', '').strip()
     if not sql_query:
         return jsonify(error='No SQL provided', results={}), 400
-    if not sql_query.lower().startswith('select'):
-        return jsonify(error='Only SELECT allowed', results={}), 400
+    # original question, if sent, so a failing cached SQL can be evicted
+    nlp_query = data.get('query', '').strip()
+    try:
+        checked = validate_sql(sql_query)
+    except SQLValidationError as e:
+        evict_generated_sql(nlp_query, sql_query)
+        return jsonify(error=str(e), results={}), 400
+    if checked.repairs:
+        app.logger.info(f"[execute_sql] Repaired identifiers: {checked.repairs}")
+    try:
+        backend = _backend(data)
+    except ValueError as e:
+        return jsonify(error=str(e), results={}), 400
 
-    app.logger.info(f"[execute_sql] SQL: {sql_query}")
+    session_id = _session_id(data)
+    request_id = data.get('request_id') or uuid.uuid4().hex
+
+    app.logger.info(f"[execute_sql] SQL: {checked.sql}")
     try:
-        conn = psycopg2.connect(
-            host=PGHOST, port=PGPORT,
-            user=PGUSER, password=PGPASSWORD,
-            dbname=DB_NAME
-        )
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(sql_query)
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        columns = list(rows[0].keys()) if rows else []
-        data = [list(r.values()) for r in rows]
+        columns, rows = cached_run_query(checked, backend, session_id, request_id)
+        data = [list(r) for r in rows]
         return jsonify(results={'columns': columns, 'data': data},
-                       row_count=len(data))
+                       row_count=len(data), request_id=request_id)
+    except QueryCancelled as e:
+        app.logger.info(f"[execute_sql] {request_id}: {e}")
+        return jsonify(error=str(e), cancelled=True, results={}), 409
     except Exception as e:
+        evict_generated_sql(nlp_query, sql_query)
         app.logger.error(f"[execute_sql] Failed: {e}", exc_info=True)
         return jsonify(error=str(e), results={}), 500
 
 
+@app.route('/cancel', methods=['POST'])
+def cancel_endpoint():
+    # force=True: tab-close beacons are sent as text/plain
+    data = request.get_json(force=True, silent=True) or {}
+    reason = data.get('reason', 'client')
+    if reason not in ('client', 'disconnect'):
+        reason = 'client'
+    cancelled = REGISTRY.cancel(_session_id(data), data.get('request_id'), reason=reason)
+    app.logger.info(f"[cancel] session={_session_id(data)} cancelled={cancelled}")
+    return jsonify(cancelled=cancelled)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return jsonify(queries=REGISTRY.metrics())
+
+
 @app.route('/generate_insights', methods=['POST'])
 def generate_insights_endpoint():
     data = request.get_json()
@@ -91,21 +324,21 @@ def generate_insights_endpoint():
     nlp_query = data.get('query', '').strip()
     if not sql_query or not nlp_query:
         return jsonify(error='SQL and original query required', insights=[]), 400
+    try:
+        checked = validate_sql(sql_query)
+    except SQLValidationError as e:
+        return jsonify(error=str(e), insights=[]), 400
+    try:
+        backend = _backend(data)
+    except ValueError as e:
+        return jsonify(error=str(e), insights=[]), 400
 
     app.logger.info(f"[generate_insights] SQL: {sql_query[:80]}...")
     try:
         # (Re‑)execute to get rows
-        conn = psycopg2.connect(
-            host=PGHOST, port=PGPORT,
-            user=PGUSER, password=PGPASSWORD,
-            dbname=DB_NAME
-        )
-        cur = conn.cursor()
-        cur.execute(sql_query)
-        cols = [d[0] for d in cur.description]
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        # own tracking key so it never supersedes the tab's running Execute
+        cols, rows = cached_run_query(checked, backend, f"{_session_id(data)}:insights",
+                                      data.get('request_id'))
 
         # Get raw LLM string
         raw = generate_insights(nlp_query, cols, rows)  # returns a string of bullet points
@@ -128,11 +361,27 @@ def generate_insights_endpoint():
 
         return jsonify(insights=insights)
 
+    except QueryCancelled as e:
+        return jsonify(error=str(e), cancelled=True, insights=[]), 409
     except Exception as e:
         app.logger.error(f"[generate_insights] Failed: {e}", exc_info=True)
         return jsonify(error=str(e), insights=[]), 500
 
 
+def _is_reloader_parent() -> bool:
+    """
+    `python app.py` / `python main.py` run with the debug reloader: the first
+    process only watches files and never serves, so it must not warm up.
+    """
+    main = sys.modules.get("__main__")
+    script = os.path.basename(getattr(main, "__file__", "") or "")
+    return script in ("app.py", "main.py") and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
+
+# ─── Start warmup with the app (any WSGI server, or the reloader child) ───
+if WARMUP_ON_START and not _is_reloader_parent():
+    WARMUP.start()
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
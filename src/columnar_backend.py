@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Embedded columnar execution backend (DuckDB) for analytical queries.
+
+The CSVs under data/ are loaded once into a compressed, columnar DuckDB
+file using the column types from docs/schema.json; generated SELECTs are
+then run on all cores and returned with the same (columns, rows) contract
+as the Postgres path.
+
+Usage:
+ # Build (or rebuild) the columnar store from data/*.csv:
+ python src/columnar_backend.py --build
+ # Run a query against it:
+ python src/columnar_backend.py --sql "SELECT payer_payer_nm, COUNT(*) FROM fct_pharmacy_clear_claim_allstatus_cluster_brand GROUP BY 1"
+
+Routing (see choose_backend):
+ EXEC_BACKEND=postgres|columnar   default backend for every query
+ COLUMNAR_TABLES=t1,t2            queries touching only these tables go columnar
+
+The generated SQL is Postgres dialect; it is transpiled to DuckDB with
+sqlglot first. SQL DuckDB still can't bind raises ColumnarUnsupported so
+callers can fall back to Postgres.
+"""
+import os
+import json
+
+import sqlglot
+
+from sql_validator import referenced_tables
+
+# ── Config ────────────────────────────────────────────────────────
+BASE_DIR        = os.path.join(os.path.dirname(__file__), '..')
+DATA_DIR        = os.path.join(BASE_DIR, 'data')
+SCHEMA_JSON     = os.path.join(BASE_DIR, 'docs', 'schema.json')
+COLUMNAR_PATH   = os.getenv("COLUMNAR_PATH", os.path.join(BASE_DIR, 'columnar_store', 'health_data.duckdb'))
+EXEC_BACKEND    = os.getenv("EXEC_BACKEND", "postgres").lower()
+COLUMNAR_TABLES = {t.strip().lower() for t in os.getenv("COLUMNAR_TABLES", "").split(",") if t.strip()}
+THREADS         = int(os.getenv("COLUMNAR_THREADS", os.cpu_count() or 1))
+
+BACKENDS = ("postgres", "columnar")
+
+# Same CSV → table mapping as load_csv.sh
+CSV_TABLES = {
+    "payments_to_hcps":         "as_lsf_v1",
+    "provider_details":         "as_providers_v1",
+    "referral_patterns":        "as_providers_referrals_v2",
+    "diagnosis_and_procedures": "diagnosis_and_procedures",
+    "pharmacy_claims":          "fct_pharmacy_clear_claim_allstatus_cluster_brand",
+    "conditions_directory":     "mf_conditions",
+    "kol_providers":            "mf_providers",
+    "kol_scores":               "mf_scores",
+}
+
+# Postgres types from schema.json → DuckDB types
+TYPE_MAP = {
+    "numeric":           "DECIMAL(38,9)",
+    "character varying": "VARCHAR",
+    "text":              "VARCHAR",
+    "double precision":  "DOUBLE",
+}
+# ────────────────────────────────────────────────────────────────────────
+
+
+class ColumnarUnsupported(Exception):
+    """DuckDB can't run this (Postgres-only) SQL; the caller may fall back to Postgres."""
+
+
+def load_schema_types(path: str = SCHEMA_JSON) -> dict[str, list[tuple[str, str]]]:
+    """Read schema.json into {table: [(column, duckdb_type), …]}."""
+    with open(path) as f:
+        schema = json.load(f)
+    return {
+        table: [(c["name"], TYPE_MAP.get(c["type"], c["type"].upper())) for c in cols]
+        for table, cols in schema.items()
+    }
+
+def choose_backend(sql: str, backend: str | None = None) -> str:
+    """
+    Pick the execution backend for one query:
+      1) an explicit per-query `backend` wins,
+      2) else, if every table the parsed SQL reads (FROM, JOIN, comma lists,
+         subqueries) is listed in COLUMNAR_TABLES → columnar,
+      3) else EXEC_BACKEND.
+    """
+    if backend:
+        backend = backend.lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        return backend
+    tables = referenced_tables(sql)
+    if tables and COLUMNAR_TABLES and tables <= COLUMNAR_TABLES:
+        return "columnar"
+    return EXEC_BACKEND
+
+def build_columnar_store(data_dir: str = DATA_DIR, store_path: str = COLUMNAR_PATH):
+    """
+    (Re)create the DuckDB file: one typed table per CSV, loaded positionally
+    like `\\copy … HEADER true` in load_csv.sh.
+    """
+    import duckdb
+
+    types = load_schema_types()
+    # tables that will be routed here must be loaded, or every routed query fails
+    required = set(CSV_TABLES.values()) if EXEC_BACKEND == "columnar" else COLUMNAR_TABLES
+    missing = [
+        f"{table} ({csv_name}.csv)" for csv_name, table in CSV_TABLES.items()
+        if table in required and not os.path.exists(os.path.join(data_dir, f"{csv_name}.csv"))
+    ]
+    if missing:
+        raise FileNotFoundError(f"CSV missing under {data_dir} for routed tables: {', '.join(missing)}")
+
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    tmp_path = store_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    con = duckdb.connect(tmp_path)
+    con.execute(f"SET threads TO {THREADS}")
+    try:
+        for csv_name, table in CSV_TABLES.items():
+            csv_path = os.path.join(data_dir, f"{csv_name}.csv")
+            if not os.path.exists(csv_path):
+                print(f"  • skipping {table}: {csv_path} not found")
+                continue
+            cols = types[table]
+            col_spec = ", ".join(f"'{name}': '{typ}'" for name, typ in cols)
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+            con.execute(
+                f"CREATE TABLE {table} AS SELECT * FROM read_csv(?, header=true, "
+                f"nullstr='', columns={{{col_spec}}})",
+                [csv_path],
+            )
+            n = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"  • {csv_name}.csv → {table} ({n} rows)")
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+    os.replace(tmp_path, store_path)
+    print(f"✅ Columnar store built at {store_path}")
+
+def to_duckdb(sql: str) -> str:
+    """Transpile Postgres-dialect SQL to DuckDB (to_char → strftime, …)."""
+    try:
+        return sqlglot.transpile(sql, read="postgres", write="duckdb")[0]
+    except sqlglot.errors.SqlglotError as e:
+        raise ColumnarUnsupported(f"Cannot transpile to DuckDB: {e}") from e
+
+def execute_sql(sql: str, store_path: str = COLUMNAR_PATH, on_connect=None):
+    """
+    Transpile the Postgres SQL, run it against the columnar store and return
+    (columns, rows). `on_connect(con)` is called with the open connection
+    before the query runs, e.g. to register `con.interrupt` for cancellation.
+    Raises ColumnarUnsupported if DuckDB can't parse/bind the query.
+    """
+    import duckdb
+
+    sql = to_duckdb(sql)
+
+    if not os.path.exists(store_path):
+        raise FileNotFoundError(
+            f"Columnar store not found at {store_path}; run `python src/columnar_backend.py --build`"
+        )
+    con = duckdb.connect(store_path, read_only=True)
+    try:
+        con.execute(f"SET threads TO {THREADS}")
+        if on_connect:
+            on_connect(con)
+        try:
+            cur = con.execute(sql)
+        except (duckdb.ParserException, duckdb.BinderException, duckdb.CatalogException) as e:
+            raise ColumnarUnsupported(str(e).splitlines()[0]) from e
+        cols = [desc[0] for desc in cur.description]
+        rows = cur.fetchall()
+    finally:
+        con.close()
+    return cols, rows
+
+
+if __name__ == "__main__":
+    import argparse
+    from tabulate import tabulate
+
+    p = argparse.ArgumentParser("Columnar execution backend")
+    p.add_argument("--build", action="store_true", help="Load data/*.csv into the columnar store")
+    p.add_argument("--data", default=DATA_DIR, help="Directory with the raw CSVs")
+    p.add_argument("--out", default=COLUMNAR_PATH, help="Path of the DuckDB file")
+    p.add_argument("--sql", type=str, help="Run a SELECT against the columnar store")
+    args = p.parse_args()
+
+    if args.build:
+        build_columnar_store(data_dir=args.data, store_path=args.out)
+    if args.sql:
+        cols, rows = execute_sql(args.sql, store_path=args.out)
+        print(tabulate(rows, headers=cols, tablefmt="psql"))
+    if not (args.build or args.sql):
+        p.print_help()
@@ -18,6 +18,7 @@ from openai import OpenAI
 from tabulate import tabulate
 # Import your SQL-generation function
 from query_rag import generate_sql
+import columnar_backend
 
 # ── Configuration ───────────────────────────────────────────────────
 # Postgres connection
@@ -42,8 +43,18 @@ def clean_sql_for_execution(sql: str) -> str:
         q = q[:-1]
     return q
 
-def execute_sql(sql: str):
-    """Run the SQL and return (columns, rows)."""
+def execute_sql(sql: str, backend: str | None = None):
+    """
+    Run the SQL and return (columns, rows).
+    `backend` ("postgres" / "columnar") overrides the configured routing.
+    """
+    if columnar_backend.choose_backend(sql, backend) == "columnar":
+        try:
+            return columnar_backend.execute_sql(sql)
+        except columnar_backend.ColumnarUnsupported as e:
+            if backend:
+                raise
+            print(f"[columnar backend can't run this query, using Postgres: {e}]")
     conn = psycopg2.connect(
         host=PGHOST, port=PGPORT, user=PGUSER, password=PGPASSWORD, dbname=DB_NAME
     )
@@ -122,6 +133,7 @@ def main():
     p = argparse.ArgumentParser("Pipeline Agent: NL→SQL→Exec→Insights")
     p.add_argument("--nl", type=str, required=True, help="Natural-language question")
     p.add_argument("--insight", action="store_true", help="Also generate LLM insights")
+    p.add_argument("--backend", choices=columnar_backend.BACKENDS, help="Override the execution backend")
     args = p.parse_args()
     
     nl = args.nl.strip()
@@ -131,7 +143,7 @@ def main():
     sql_exec = clean_sql_for_execution(sql)
     
     # 2) Execute and display results
-    cols, rows = execute_sql(sql_exec)
+    cols, rows = execute_sql(sql_exec, backend=args.backend)
     if not rows:
         print("No results returned.")
     else:
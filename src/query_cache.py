@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+In-process caches for the NL→SQL and SQL→result steps, plus the
+persisted query log that startup warmup replays.
+
+SQL_CACHE     normalized question  → generated SQL
+RESULT_CACHE  (backend, canonical SQL from sql_validator) → (columns, rows),
+              only for results of at most RESULT_CACHE_MAX_ROWS rows
+"""
+import os
+import json
+import time
+import threading
+from collections import Counter, OrderedDict
+
+# ── Config ────────────────────────────────────────────────────────
+SQL_CACHE_SIZE        = int(os.getenv("SQL_CACHE_SIZE", "512"))
+RESULT_CACHE_SIZE     = int(os.getenv("RESULT_CACHE_SIZE", "128"))
+RESULT_CACHE_TTL      = float(os.getenv("RESULT_CACHE_TTL", "600"))    # seconds
+RESULT_CACHE_MAX_ROWS = int(os.getenv("RESULT_CACHE_MAX_ROWS", "10000"))  # larger results are not cached
+QUERY_LOG             = os.getenv("QUERY_LOG", os.path.join(os.path.dirname(__file__), '..', 'logs', 'query_log.jsonl'))
+QUERY_LOG_MAX_BYTES   = int(os.getenv("QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))  # rotate to <log>.1 beyond this
+# ────────────────────────────────────────────────────────────────────────
+
+
+class LRUCache:
+    """Thread-safe LRU with optional per-entry TTL (ttl=None → never expires)."""
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored = item
+            if self.ttl is not None and time.monotonic() - stored > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return None if item is None else item[0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+SQL_CACHE    = LRUCache(SQL_CACHE_SIZE)
+RESULT_CACHE = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+_log_lock = threading.Lock()
+
+
+def log_question(question: str, path: str = QUERY_LOG, max_bytes: int = QUERY_LOG_MAX_BYTES):
+    """
+    Append one successfully answered question to the JSONL query log.
+    Past max_bytes the log is rotated to <path>.1 (replacing the previous
+    one), so at most two files are kept and read.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps({"ts": time.time(), "question": question})
+    with _log_lock:
+        if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            os.replace(path, path + ".1")
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+def top_questions(n: int, path: str = QUERY_LOG) -> list[str]:
+    """The n most frequently asked questions in the log + its rotation (by normalized text)."""
+    if n <= 0:
+        return []
+    counts, original = Counter(), {}
+    for fn in (path + ".1", path):
+        if not os.path.exists(fn):
+            continue
+        with open(fn) as f:
+            for line in f:
+                try:
+                    q = json.loads(line)["question"]
+                except (ValueError, KeyError):
+                    continue
+                key = q.lower().strip()
+                counts[key] += 1
+                original.setdefault(key, q)
+    return [original[k] for k, _ in counts.most_common(n)]
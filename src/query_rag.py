@@ -6,9 +6,11 @@ and separate debug vs. query modes.
 import os
 import re
 import warnings
+from functools import lru_cache
 
 from intent_agent import intent_agent
 from extract_entities_agent import extract_entities
+from sql_validator import validate_sql
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.chat_models import ChatOpenAI
 from langchain_community.vectorstores import FAISS
@@ -27,6 +29,7 @@ MODEL_REASON = "o4-mini"
 TEMPERATURE  = 0.0
 # ────────────────────────────────────────────────────────────────────────
 
+@lru_cache(maxsize=1)
 def load_full_schema() -> str:
     try:
         return open(FULL_SCHEMA, 'r').read()
@@ -45,9 +48,14 @@ def extract_relevant_schema(tables: list[str]) -> str:
             out.append(line)
     return "\n".join(out)
 
-def retrieve_examples(question: str, selected_tables: list[str]) -> str:
+@lru_cache(maxsize=1)
+def load_vector_store():
+    """Load the FAISS index once per process."""
     emb = OpenAIEmbeddings(openai_api_key=API_KEY)
-    vs  = FAISS.load_local(INDEX_PATH, emb, allow_dangerous_deserialization=True)
+    return FAISS.load_local(INDEX_PATH, emb, allow_dangerous_deserialization=True)
+
+def retrieve_examples(question: str, selected_tables: list[str]) -> str:
+    vs  = load_vector_store()
     retriever = vs.as_retriever(
         search_kwargs={"k": TOP_K},
         filter=lambda md: bool(set(md["tables"]) & set(selected_tables))
@@ -64,9 +72,11 @@ def clean_sql(sql: str) -> str:
 
 def generate_sql(question: str, debug: bool = False) -> str:
     """
-    Runs intent_agent → extract_entities → builds prompt → calls LLM.
+    Runs intent_agent → extract_entities → builds prompt → calls LLM
+    → validates/repairs the SQL against schema.json.
     If debug=True, prints the full prompt and model choice first.
-    Returns only the cleaned SQL.
+    Returns only the cleaned SQL; raises SQLValidationError if it isn't
+    a valid SELECT over the schema.
     """
     # 1) Extract via intent_agent (which calls extract_entities internally)
     info = intent_agent(question)
@@ -118,7 +128,12 @@ def generate_sql(question: str, debug: bool = False) -> str:
     # 5) LLM call
     llm = ChatOpenAI(model_name=model, temperature=TEMPERATURE, openai_api_key=API_KEY)
     resp = llm([HumanMessage(content=prompt)])
-    return clean_sql(resp.content)
+
+    # 6) Local parse + schema check, fixing near-miss identifiers
+    checked = validate_sql(clean_sql(resp.content))
+    if debug and checked.repairs:
+        print("[Repaired identifiers: " + ", ".join(f"{a} → {b}" for a, b in checked.repairs) + "]\n")
+    return checked.sql
 
 if __name__ == "__main__":
     import argparse
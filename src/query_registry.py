@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+In-flight query tracking and cancellation.
+
+Each running query is registered under its session id (one browser tab)
+and request id. A newer query from the same session supersedes the old
+one, and /cancel (explicit button or tab close) cancels it; in both cases
+the backend query is interrupted (psycopg2 `connection.cancel()` /
+DuckDB `connection.interrupt()`) so it stops holding a connection and CPU.
+
+Usage (inside a request handler):
+    with REGISTRY.track(session_id, request_id) as q:
+        conn = psycopg2.connect(...)
+        q.attach(conn.cancel)
+        cur.execute(sql)            # raises QueryCancelled if cancelled
+"""
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class QueryCancelled(Exception):
+    """The query was cancelled before it finished."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Query cancelled ({reason})")
+        self.reason = reason
+
+
+class InFlightQuery:
+    def __init__(self, session_id: str, request_id: str):
+        self.session_id = session_id
+        self.request_id = request_id
+        self.reason = None            # set once cancelled
+        self._cancel_fn = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def attach(self, cancel_fn):
+        """Register the backend's cancel hook; raise now if already cancelled."""
+        with self._lock:
+            self._cancel_fn = cancel_fn
+            reason = self.reason
+        if reason:
+            raise QueryCancelled(reason)
+
+    def detach(self):
+        """Drop the cancel hook, e.g. before a pooled connection is reused."""
+        with self._lock:
+            self._cancel_fn = None
+
+    def cancel(self, reason: str) -> bool:
+        # the hook runs under the lock so it can't race with detach()
+        with self._lock:
+            if self.reason:
+                return False
+            self.reason = reason
+            if self._cancel_fn:
+                try:
+                    self._cancel_fn()
+                except Exception as e:
+                    # e.g. the backend connection was already closed; the
+                    # caller (a newer request or /cancel) must not fail for it
+                    log.warning(f"[cancel] {self.request_id}: cancel hook failed: {e}")
+        return True
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict[str, InFlightQuery] = {}
+        self._counts = Counter()
+
+    @contextmanager
+    def track(self, session_id: str, request_id: str):
+        """Register a query for the session, superseding any older one."""
+        q = InFlightQuery(session_id, request_id)
+        with self._lock:
+            previous = self._inflight.get(session_id)
+            self._inflight[session_id] = q
+            self._counts["started"] += 1
+
+        try:
+            if previous:
+                self._cancel(previous, "superseded")
+            yield q
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            if q.cancelled:
+                # backend raised because we interrupted it
+                raise QueryCancelled(q.reason) from e
+            self._count("failed")
+            raise
+        else:
+            if q.cancelled:
+                raise QueryCancelled(q.reason)
+            self._count("completed")
+        finally:
+            with self._lock:
+                if self._inflight.get(session_id) is q:
+                    del self._inflight[session_id]
+
+    def cancel(self, session_id: str, request_id: str | None = None, reason: str = "client") -> bool:
+        """
+        Cancel the session's in-flight query (only if it matches request_id,
+        when given). Returns True if something was cancelled.
+        """
+        with self._lock:
+            q = self._inflight.get(session_id)
+        if q is None or (request_id and q.request_id != request_id):
+            return False
+        return self._cancel(q, reason)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._counts, "in_flight": len(self._inflight)}
+
+    def _cancel(self, q: InFlightQuery, reason: str) -> bool:
+        if not q.cancel(reason):
+            return False
+        with self._lock:
+            self._counts["cancelled"] += 1
+            self._counts[f"cancelled_{reason}"] += 1
+        return True
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+
+REGISTRY = QueryRegistry()
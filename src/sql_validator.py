@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Local parse-and-validate stage for generated SQL.
+
+Parses the LLM output against the schema catalog (docs/schema.json) before
+it reaches the database:
+  - strips markdown / label leftovers,
+  - rejects anything that is not a single read-only SELECT,
+  - repairs near-miss table and column names by edit distance,
+  - produces a canonical form of the SQL usable as a cache / dedup key.
+
+Usage:
+ python src/sql_validator.py "SELECT payer_payer_name FROM fct_pharmacy_clear_claim_allstatus_cluster_brnd"
+ # Regression check: every few-shot example must pass unchanged
+ python src/sql_validator.py --check-examples
+"""
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import sqlglot
+from sqlglot import exp
+
+# ── Config ────────────────────────────────────────────────────────
+SCHEMA_JSON  = os.path.join(os.path.dirname(__file__), '..', 'docs', 'schema.json')
+EXAMPLES     = os.path.join(os.path.dirname(__file__), '..', 'docs', 'examples')
+DIALECT      = "postgres"
+MAX_DISTANCE = 2      # max edits for an identifier to be auto-repaired
+# ────────────────────────────────────────────────────────────────────────
+
+# Statements / clauses that write, lock or change session state
+FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+    exp.Alter, exp.TruncateTable, exp.Copy, exp.Grant, exp.Command,
+    exp.Set, exp.Transaction, exp.Commit, exp.Into, exp.Lock,
+)
+
+# Functions with side effects (admin, sleep, large objects, remote / dynamic SQL)
+FORBIDDEN_FUNC_PREFIXES = ("pg_", "lo_", "dblink")
+FORBIDDEN_FUNCS = {
+    "set_config", "query_to_xml", "query_to_xml_and_xmlschema",
+    "query_to_xmlschema", "cursor_to_xml", "cursor_to_xmlschema",
+}
+
+
+class SQLValidationError(ValueError):
+    """Generated SQL is not a valid read-only query against the schema."""
+
+
+@dataclass
+class ValidatedSQL:
+    sql: str                                            # SQL to execute (repaired if needed)
+    canonical: str                                      # normalized form, stable cache key
+    repairs: list[tuple[str, str]] = field(default_factory=list)   # (wrong, fixed)
+
+
+@lru_cache(maxsize=1)
+def load_catalog(path: str = SCHEMA_JSON) -> dict[str, set[str]]:
+    """Read schema.json into {table: {columns…}} (all lower-case)."""
+    with open(path) as f:
+        schema = json.load(f)
+    return {t.lower(): {c["name"].lower() for c in cols} for t, cols in schema.items()}
+
+def strip_markdown(sql: str) -> str:
+    """Remove code fences, leading labels and trailing semicolons."""
+    q = re.sub(r"```(?:sql)?", "", sql, flags=re.IGNORECASE).strip()
+    q = re.sub(r"^(?:SQL|Query|A|Answer):\s*", "", q, flags=re.IGNORECASE)
+    return q.strip().rstrip(";").strip()
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+def closest(name: str, candidates, max_distance: int = MAX_DISTANCE) -> str | None:
+    """Unique nearest candidate within max_distance edits, else None."""
+    scored = sorted((edit_distance(name, c), c) for c in candidates)
+    if not scored or scored[0][0] > max_distance:
+        return None
+    if len(scored) > 1 and scored[1][0] == scored[0][0]:
+        return None   # ambiguous
+    return scored[0][1]
+
+def referenced_tables(sql: str) -> set[str]:
+    """Real (non-CTE) tables the SQL reads, lower-cased; empty if it doesn't parse."""
+    try:
+        tree = sqlglot.parse_one(sql, read=DIALECT)
+    except sqlglot.errors.SqlglotError:
+        return set()
+    ctes = {c.alias_or_name.lower() for c in tree.find_all(exp.CTE)}
+    return {t.name.lower() for t in tree.find_all(exp.Table)
+            if t.name and t.name.lower() not in ctes}
+
+def parse_select(sql: str) -> exp.Expression:
+    """Parse exactly one statement and make sure it is a read-only query."""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=DIALECT) if s is not None]
+    except sqlglot.errors.SqlglotError as e:   # ParseError and TokenError
+        raise SQLValidationError(f"SQL does not parse: {e}") from e
+    if len(statements) != 1:
+        raise SQLValidationError(f"Expected one statement, got {len(statements)}")
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        raise SQLValidationError(f"Only SELECT allowed, got {tree.key.upper()}")
+    for node in tree.walk():
+        if isinstance(node, FORBIDDEN_NODES):
+            raise SQLValidationError(f"Only SELECT allowed, found {node.key.upper()}")
+        if isinstance(node, exp.Func):
+            name = (node.name if isinstance(node, exp.Anonymous) else node.sql_name()).lower()
+            if name.startswith(FORBIDDEN_FUNC_PREFIXES) or name in FORBIDDEN_FUNCS:
+                raise SQLValidationError(f"Function {name}() is not allowed")
+    return tree
+
+def _repair_tables(tree: exp.Expression, catalog: dict[str, set[str]], repairs: list) -> dict[str, str]:
+    """Fix unknown table names; return {alias_or_name: real_table} for schema tables."""
+    ctes = {c.alias_or_name.lower() for c in tree.find_all(exp.CTE)}
+    aliases = {}
+    for table in tree.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or name in ctes:
+            continue
+        if name not in catalog:
+            fixed = closest(name, catalog)
+            if fixed is None:
+                raise SQLValidationError(f"Unknown table '{table.name}'")
+            repairs.append((table.name, fixed))
+            table.set("this", exp.to_identifier(fixed))
+            name = fixed
+        aliases[name] = name
+        if table.alias:
+            aliases[table.alias.lower()] = name
+    return aliases
+
+def _repair_columns(tree: exp.Expression, catalog: dict[str, set[str]],
+                    aliases: dict[str, str], repairs: list):
+    """Fix unknown column names against the tables the query reads."""
+    in_scope = set().union(*(catalog[t] for t in set(aliases.values())))
+    # output names of projections, CTEs and derived tables are valid references too
+    derived = {a.alias.lower() for a in tree.find_all(exp.Alias)}
+    for t_alias in tree.find_all(exp.TableAlias):
+        derived |= {c.name.lower() for c in t_alias.columns}
+        # the alias of UNNEST(...) AS s / generate_series(...) g is itself a column
+        source = t_alias.parent
+        if not (isinstance(source, exp.Table) and source.name.lower() in catalog):
+            derived.add(t_alias.name.lower())
+
+    for col in tree.find_all(exp.Column):
+        name = col.name.lower()
+        if not name or isinstance(col.this, exp.Star):
+            continue
+        qualifier = col.table.lower()
+        if qualifier:
+            if qualifier not in aliases:
+                continue   # CTE / subquery alias: its columns are checked where defined
+            known = catalog[aliases[qualifier]]
+        else:
+            known = in_scope | derived
+        if name in known:
+            continue
+        fixed = closest(name, known)
+        if fixed is None:
+            where = f" in {aliases[qualifier]}" if qualifier else ""
+            raise SQLValidationError(f"Unknown column '{col.name}'{where}")
+        repairs.append((col.name, fixed))
+        col.set("this", exp.to_identifier(fixed))
+
+def canonical_sql(tree: exp.Expression) -> str:
+    """Normalized single-line SQL: lower-case identifiers, upper-case keywords."""
+    return tree.sql(dialect=DIALECT, normalize=True, pretty=False)
+
+def validate_sql(sql: str, catalog: dict[str, set[str]] | None = None) -> ValidatedSQL:
+    """
+    Parse, check and repair generated SQL.
+    Raises SQLValidationError if it is not a SELECT or can't be resolved.
+    """
+    catalog = catalog or load_catalog()
+    q = strip_markdown(sql)
+    if not q:
+        raise SQLValidationError("Empty SQL")
+    tree = parse_select(q)
+
+    repairs: list[tuple[str, str]] = []
+    aliases = _repair_tables(tree, catalog, repairs)
+    _repair_columns(tree, catalog, aliases, repairs)
+
+    # Keep the model's own text unless something had to be fixed
+    out = tree.sql(dialect=DIALECT) if repairs else q
+    return ValidatedSQL(sql=out, canonical=canonical_sql(tree), repairs=repairs)
+
+
+def check_examples(examples_dir: str = EXAMPLES) -> list[tuple[str, str]]:
+    """Validate every few-shot SQL (validated/ex*.yaml + nl_sql_seed.yaml); return failures."""
+    import glob
+    import yaml
+
+    examples = []
+    for fn in sorted(glob.glob(os.path.join(examples_dir, 'validated', 'ex*.yaml'))):
+        with open(fn) as f:
+            examples.append((os.path.basename(fn), yaml.safe_load(f)))
+    seed = os.path.join(examples_dir, 'nl_sql_seed.yaml')
+    if os.path.exists(seed):
+        with open(seed) as f:
+            examples += [(f"nl_sql_seed.yaml#{ex['id']}", ex) for ex in yaml.safe_load(f)]
+
+    failures = []
+    for name, ex in examples:
+        try:
+            validate_sql(ex['sql'])
+        except SQLValidationError as e:
+            failures.append((name, str(e)))
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["--check-examples"]:
+        failures = check_examples()
+        for name, err in failures:
+            print(f"❌ {name}: {err}")
+        print("✅ all examples validate" if not failures else f"{len(failures)} example(s) failed")
+        sys.exit(1 if failures else 0)
+    try:
+        res = validate_sql(" ".join(sys.argv[1:]))
+    except SQLValidationError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for wrong, fixed in res.repairs:
+        print(f"  • {wrong} → {fixed}")
+    print(res.sql)
+    print(f"\n[canonical] {res.canonical}")
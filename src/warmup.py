@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Startup warmup: runs a list of named steps in a background thread and
+reports progress, so the server only reports ready once imports, the
+FAISS index, the schema, DB connections and caches are warm.
+
+Usage:
+    WARMUP = Warmup([("load retriever", load_vector_store), ...])
+    WARMUP.start()
+    WARMUP.status()   # {"ready": False, "done": 1, "total": 4, ...}
+"""
+import time
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class Warmup:
+    def __init__(self, steps: list[tuple[str, callable]]):
+        self.steps = steps
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = {
+            "ready": False,
+            "running": False,
+            "done": 0,
+            "total": len(steps),
+            "current": None,
+            "errors": {},
+            "seconds": {},
+        }
+
+    def start(self) -> threading.Thread:
+        """Run the steps once, in a daemon thread."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def run(self):
+        self._update(running=True)
+        for name, fn in self.steps:
+            self._update(current=name)
+            t0 = time.monotonic()
+            try:
+                fn()
+            except Exception as e:
+                # a failed step (e.g. empty query log, DB down) must not block readiness
+                log.warning(f"[warmup] {name} failed: {e}", exc_info=True)
+                with self._lock:
+                    self._state["errors"][name] = str(e)
+            with self._lock:
+                self._state["seconds"][name] = round(time.monotonic() - t0, 3)
+                self._state["done"] += 1
+        self._update(running=False, current=None, ready=True)
+        log.info(f"[warmup] complete: {self.status()}")
+
+    def progress(self, detail: str):
+        """Let a long step report sub-progress (e.g. 'replay 3/20')."""
+        with self._lock:
+            if self._state["current"]:
+                self._state["current"] = f"{self._state['current'].split(' [')[0]} [{detail}]"
+
+    def status(self) -> dict:
+        with self._lock:
+            return {**self._state,
+                    "errors": dict(self._state["errors"]),
+                    "seconds": dict(self._state["seconds"])}
+
+    def _update(self, **kw):
+        with self._lock:
+            self._state.update(kw)
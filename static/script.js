@@ -7,6 +7,9 @@ class HealthcareSearchInterface {
     constructor() {
         this.currentQuery = '';
         this.currentSQL = '';
+        // Per-tab id so the server can supersede/cancel this tab's queries
+        this.sessionId = crypto.randomUUID();
+        this.currentRequestId = null;
         this.initializeElements();
         this.bindEventListeners();
     }
@@ -19,6 +22,7 @@ class HealthcareSearchInterface {
         this.generateSqlBtn = document.getElementById('generateSqlBtn');
         this.retryBtn = document.getElementById('retryBtn');
         this.executeBtn = document.getElementById('executeBtn');
+        this.cancelBtn = document.getElementById('cancelBtn');
         this.copyBtn = document.getElementById('copyBtn');
         this.insightsBtn = document.getElementById('insightsBtn');
         
@@ -48,6 +52,9 @@ class HealthcareSearchInterface {
         
         // Execute button
         this.executeBtn.addEventListener('click', () => this.handleExecuteSQL());
+
+        // Cancel button
+        this.cancelBtn.addEventListener('click', () => this.cancelRunningQuery('client'));
         
         // Copy button
         this.copyBtn.addEventListener('click', () => this.handleCopySQL());
@@ -64,6 +71,18 @@ class HealthcareSearchInterface {
         
         // Input validation
         this.nlpQueryInput.addEventListener('input', () => this.validateInput());
+
+        // Cancel any running query when the tab is closed
+        window.addEventListener('pagehide', () => this.cancelRunningQuery('disconnect'));
+    }
+
+    cancelRunningQuery(reason = 'client') {
+        if (!this.currentRequestId) return;
+        navigator.sendBeacon('http://localhost:5001/cancel', JSON.stringify({
+            session_id: this.sessionId,
+            request_id: this.currentRequestId,
+            reason: reason
+        }));
     }
 
     validateInput() {
@@ -79,7 +98,7 @@ class HealthcareSearchInterface {
         }
     }
 
-    async handleGenerateSQL() {
+    async handleGenerateSQL(regenerate = false) {
         const query = this.nlpQueryInput.value.trim();
         
         if (!query) {
@@ -98,7 +117,8 @@ class HealthcareSearchInterface {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ query: query })
+                // regenerate: skip the server's cached SQL for this question
+                body: JSON.stringify({ query: query, regenerate: regenerate })
             });
 
             const data = await response.json();
@@ -127,6 +147,12 @@ class HealthcareSearchInterface {
 
         this.showLoading(true);
         this.hideError();
+        // Execute stays clickable: a second click supersedes the running query
+        this.executeBtn.disabled = false;
+
+        const requestId = crypto.randomUUID();
+        this.currentRequestId = requestId;
+        this.cancelBtn.style.display = 'inline-block';
 
         try {
             const response = await fetch('http://localhost:5001/execute_sql', {
@@ -134,11 +160,28 @@ class HealthcareSearchInterface {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ sql: this.currentSQL })
+                body: JSON.stringify({
+                    sql: this.currentSQL,
+                    query: this.currentQuery,
+                    session_id: this.sessionId,
+                    request_id: requestId
+                })
             });
 
             const data = await response.json();
 
+            if (data.cancelled) {
+                console.log(`Query ${requestId} cancelled`);
+                // stay quiet only if a newer query of ours replaced this one
+                if (this.currentRequestId === requestId) {
+                    this.showError('Query was cancelled.');
+                }
+                return;
+            }
+            // a newer Execute click owns the UI now; drop this stale response
+            if (this.currentRequestId !== requestId) {
+                return;
+            }
             if (!response.ok) {
                 throw new Error(data.error || 'Failed to execute SQL');
             }
@@ -147,9 +190,15 @@ class HealthcareSearchInterface {
 
         } catch (error) {
             console.error('Error executing SQL:', error);
-            this.showError(`Failed to execute SQL: ${error.message}`);
+            if (this.currentRequestId === requestId) {
+                this.showError(`Failed to execute SQL: ${error.message}`);
+            }
         } finally {
-            this.showLoading(false);
+            if (this.currentRequestId === requestId) {
+                this.currentRequestId = null;
+                this.cancelBtn.style.display = 'none';
+                this.showLoading(false);
+            }
         }
     }
 
@@ -159,7 +208,7 @@ class HealthcareSearchInterface {
         this.hideSQL();
         this.hideResults();
         this.hideInsights();
-        this.handleGenerateSQL();
+        this.handleGenerateSQL(true);
     }
 
     handleCopySQL() {
@@ -267,6 +316,7 @@ class HealthcareSearchInterface {
         this.generateSqlBtn.disabled = show;
         this.retryBtn.disabled = show;
         this.executeBtn.disabled = show;
+        this.insightsBtn.disabled = show;
     }
 
     hideSQL() {
@@ -294,7 +344,8 @@ class HealthcareSearchInterface {
                 },
                 body: JSON.stringify({ 
                     sql: this.currentSQL,
-                    query: this.currentQuery 
+                    query: this.currentQuery,
+                    session_id: this.sessionId
                 })
             });
 
@@ -372,4 +423,5 @@ console.log('%cHealthcare Data Search Interface', 'color: #2ea043; font-size: 16
 console.log('%cIntegration Points:', 'color: #1f6feb; font-weight: bold;');
 console.log('• POST /generate_sql - Convert NLP to SQL');
 console.log('• POST /execute_sql - Execute generated SQL');
+console.log('• POST /cancel - Cancel the running query');
 console.log('%cReady for backend integration!', 'color: #2ea043;');